@@ -0,0 +1,65 @@
+import os
+
+from sqlalchemy import create_engine, text
+
+
+# One-off migration adding the participation change log (`participation_changes` and
+# `participation_change_horizons`, declared in models.py) to an existing Postgres
+# database. New databases get both from create_all in copy_to_supabase.py. Requires
+# `schools`, so run add_school_tenancy.py first.
+#
+# Safe to re-run: every step is IF NOT EXISTS.
+
+STEPS = [
+    """
+    CREATE TABLE IF NOT EXISTS participation_changes (
+        id BIGSERIAL PRIMARY KEY,
+        school_id INTEGER NOT NULL REFERENCES schools(id),
+        activity_id INTEGER NOT NULL,
+        student_id INTEGER NOT NULL,
+        op VARCHAR(6) NOT NULL,
+        old_position INTEGER,
+        new_position INTEGER,
+        old_team_name VARCHAR(100),
+        new_team_name VARCHAR(100),
+        changed_by VARCHAR(100),
+        changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_participation_changes_school_id ON participation_changes (school_id, id)",
+    """
+    CREATE INDEX IF NOT EXISTS ix_participation_changes_key
+    ON participation_changes (school_id, activity_id, student_id)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS participation_change_horizons (
+        school_id INTEGER PRIMARY KEY REFERENCES schools(id),
+        pruned_through BIGINT NOT NULL
+    )
+    """,
+]
+
+
+def _require_env(var_name: str) -> str:
+    value = os.environ.get(var_name)
+    if not value or not value.strip():
+        raise RuntimeError(f"Environment variable {var_name} is required")
+    return value
+
+
+def main() -> None:
+    url = _require_env("DATABASE")
+    if url.startswith("postgresql://"):
+        url = url.replace("postgresql://", "postgresql+psycopg://")
+    engine = create_engine(url, pool_pre_ping=True)
+
+    with engine.begin() as conn:
+        print("Adding participation change log...")
+        for stmt in STEPS:
+            conn.execute(text(stmt))
+
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
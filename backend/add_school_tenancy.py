@@ -0,0 +1,184 @@
+import argparse
+import os
+
+from sqlalchemy import create_engine, text
+
+import partitions
+
+
+# One-off migration of an existing Postgres database to per-school tenancy:
+#   - creates `schools` from the distinct students.school_name values
+#   - adds school_id to students, activities and activity_participants and backfills it;
+#     an activity goes to the school with the most participants (ties: lowest id) and
+#     every other school taking part gets its own copy
+#   - gives activity_participants a primary key led by school_id, unless it has one
+#   - creates the tenant-aware composite indexes declared in models.py
+# With --partition, activity_participants is additionally rebuilt as a LIST-partitioned
+# table with one partition per school plus a DEFAULT partition.
+#
+# Safe to re-run: every step is IF NOT EXISTS, only touches NULL school_id rows or is
+# skipped once done.
+
+STEPS = [
+    """
+    CREATE TABLE IF NOT EXISTS schools (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR(100) NOT NULL UNIQUE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_schools_id ON schools (id)",
+    """
+    INSERT INTO schools (name)
+    SELECT DISTINCT school_name FROM students WHERE school_name IS NOT NULL
+    ON CONFLICT (name) DO NOTHING
+    """,
+    "ALTER TABLE students ADD COLUMN IF NOT EXISTS school_id INTEGER REFERENCES schools(id)",
+    """
+    UPDATE students s SET school_id = sc.id
+    FROM schools sc WHERE sc.name = s.school_name AND s.school_id IS NULL
+    """,
+    "ALTER TABLE students ALTER COLUMN school_id SET NOT NULL",
+    "ALTER TABLE activities ADD COLUMN IF NOT EXISTS school_id INTEGER REFERENCES schools(id)",
+    # An activity belongs to the school most of its participants come from;
+    # activities nobody has joined yet go to the first school.
+    """
+    UPDATE activities a SET school_id = top.school_id
+    FROM (
+        SELECT DISTINCT ON (ap.activity_id) ap.activity_id, s.school_id
+        FROM activity_participants ap JOIN students s ON s.id = ap.student_id
+        GROUP BY ap.activity_id, s.school_id
+        ORDER BY ap.activity_id, count(*) DESC, s.school_id
+    ) top
+    WHERE a.id = top.activity_id AND a.school_id IS NULL
+    """,
+    "UPDATE activities SET school_id = (SELECT min(id) FROM schools) WHERE school_id IS NULL",
+    "ALTER TABLE activities ALTER COLUMN school_id SET NOT NULL",
+    "ALTER TABLE activity_participants ADD COLUMN IF NOT EXISTS school_id INTEGER REFERENCES schools(id)",
+    """
+    UPDATE activity_participants ap SET school_id = s.school_id
+    FROM students s WHERE s.id = ap.student_id AND ap.school_id IS NULL
+    """,
+    "ALTER TABLE activity_participants ALTER COLUMN school_id SET NOT NULL",
+    # The old (activity_id, student_id) unique constraint; the new primary key covers it
+    "ALTER TABLE activity_participants DROP CONSTRAINT IF EXISTS uix_activity_student",
+    "CREATE INDEX IF NOT EXISTS ix_students_school_room_year ON students (school_id, room, school_year)",
+    "CREATE INDEX IF NOT EXISTS ix_students_school_year ON students (school_id, school_year)",
+    "CREATE INDEX IF NOT EXISTS ix_activities_school_ui_date ON activities (school_id, show_in_ui, activity_date)",
+    "CREATE INDEX IF NOT EXISTS ix_participants_school_student ON activity_participants (school_id, student_id)",
+]
+
+# Rebuild activity_participants as a partitioned table. Constraint and index names
+# must be free for the new table, so the old ones are renamed away first (the primary
+# key in main(), as its name is looked up).
+PARTITION_STEPS = [
+    "ALTER TABLE activity_participants RENAME TO activity_participants_unpartitioned",
+    "ALTER INDEX ix_participants_school_student RENAME TO ix_participants_school_student_old",
+    """
+    CREATE TABLE activity_participants (
+        school_id INTEGER NOT NULL REFERENCES schools(id),
+        activity_id INTEGER NOT NULL REFERENCES activities(id),
+        student_id INTEGER NOT NULL REFERENCES students(id),
+        position INTEGER,
+        team_name VARCHAR(100),
+        PRIMARY KEY (school_id, activity_id, student_id)
+    ) PARTITION BY LIST (school_id)
+    """,
+    "CREATE INDEX ix_participants_school_student ON activity_participants (school_id, student_id)",
+    "CREATE TABLE activity_participants_default PARTITION OF activity_participants DEFAULT",
+]
+
+
+def _require_env(var_name: str) -> str:
+    value = os.environ.get(var_name)
+    if not value or not value.strip():
+        raise RuntimeError(f"Environment variable {var_name} is required")
+    return value
+
+
+def _primary_key(conn):
+    """Name and leading column of activity_participants' primary key, or None."""
+    return conn.execute(text(
+        "SELECT con.conname, att.attname FROM pg_constraint con "
+        "JOIN pg_attribute att ON att.attrelid = con.conrelid AND att.attnum = con.conkey[1] "
+        "WHERE con.conrelid = 'activity_participants'::regclass AND con.contype = 'p'"
+    )).first()
+
+
+def _split_shared_activities(conn) -> int:
+    """Give every other school with participants in an activity its own copy of it.
+
+    Activities used to be shared by all schools; each now has a single owner, so the
+    other schools' participation rows are moved to their copy instead of disappearing
+    from that school's views. Returns the number of copies made.
+    """
+    pairs = conn.execute(text(
+        "SELECT DISTINCT ap.activity_id, ap.school_id FROM activity_participants ap "
+        "JOIN activities a ON a.id = ap.activity_id WHERE a.school_id <> ap.school_id "
+        "ORDER BY ap.activity_id, ap.school_id"
+    )).all()
+    for activity_id, school_id in pairs:
+        params = {"activity_id": activity_id, "school_id": school_id}
+        params["copy_id"] = conn.execute(text(
+            "INSERT INTO activities (school_id, year, name, activity_date, is_team, show_in_ui) "
+            "SELECT :school_id, year, name, activity_date, is_team, show_in_ui FROM activities "
+            "WHERE id = :activity_id RETURNING id"
+        ), params).scalar_one()
+        conn.execute(text(
+            "UPDATE activity_participants SET activity_id = :copy_id "
+            "WHERE activity_id = :activity_id AND school_id = :school_id"
+        ), params)
+    return len(pairs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migrate an existing database to per-school tenancy.")
+    parser.add_argument("--partition", action="store_true", help="also partition activity_participants by school")
+    args = parser.parse_args()
+
+    url = _require_env("DATABASE")
+    if url.startswith("postgresql://"):
+        url = url.replace("postgresql://", "postgresql+psycopg://")
+    engine = create_engine(url, pool_pre_ping=True)
+
+    with engine.begin() as conn:
+        print("Adding school tenancy...")
+        for stmt in STEPS:
+            conn.execute(text(stmt))
+
+        # Rebuilding the key locks and rewrites every index, so only do it once
+        pk = _primary_key(conn)
+        if pk is None or pk.attname != "school_id":
+            if pk is not None:
+                conn.execute(text(f'ALTER TABLE activity_participants DROP CONSTRAINT "{pk.conname}"'))
+            conn.execute(text("ALTER TABLE activity_participants ADD PRIMARY KEY (school_id, activity_id, student_id)"))
+
+        copies = _split_shared_activities(conn)
+        if copies:
+            print(f"Copied {copies} shared activities to the other schools taking part.")
+
+        if args.partition and not partitions.is_partitioned(conn):
+            print("Partitioning activity_participants by school...")
+            conn.execute(text(
+                f'ALTER TABLE activity_participants RENAME CONSTRAINT "{_primary_key(conn).conname}" '
+                "TO activity_participants_unpartitioned_pkey"
+            ))
+            for stmt in PARTITION_STEPS:
+                conn.execute(text(stmt))
+            conn.execute(text(
+                f"INSERT INTO activity_participants ({partitions.COLUMNS}) "
+                f"SELECT {partitions.COLUMNS} FROM activity_participants_unpartitioned"
+            ))
+            conn.execute(text("DROP TABLE activity_participants_unpartitioned"))
+
+        # Also picks up schools added since an earlier run; their rows move out of DEFAULT
+        if partitions.is_partitioned(conn):
+            school_ids = conn.execute(text("SELECT id FROM schools ORDER BY id")).scalars().all()
+            for school_id in school_ids:
+                partitions.ensure_school_partition(conn, school_id)
+            print(f"Ensured {len(school_ids)} school partitions.")
+
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
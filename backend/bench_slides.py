@@ -0,0 +1,137 @@
+"""Benchmark certificate slide duplication.
+
+Compares the old python-pptx shape-by-shape duplication against slides.clone_slide
+for N recipients, reporting per-slide time, peak RSS growth (each variant in its own
+process), peak traced Python memory and output size.
+
+    python bench_slides.py                      # synthetic template, 500 recipients
+    python bench_slides.py -n 1000 --template path/to/template.pptx
+"""
+import argparse
+import os
+import resource
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from copy import deepcopy
+from io import BytesIO
+
+from pptx import Presentation
+from pptx.enum.shapes import MSO_SHAPE_TYPE
+from pptx.util import Inches
+
+from slides import clone_slide, remove_slide
+
+
+def _png(width: int, height: int) -> bytes:
+    """Return an uncompressed-ish RGB PNG so the benchmark needs no imaging library."""
+    raw = b"".join(b"\x00" + bytes((x * 7 + y * 3) % 256 for x in range(width * 3)) for y in range(height))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+def _synthetic_template() -> bytes:
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[5])
+    slide.shapes.title.text = "Certificate for {name}"
+    slide.shapes.add_picture(BytesIO(_png(600, 400)), Inches(1), Inches(1.5), width=Inches(4))
+    slide.shapes.add_picture(BytesIO(_png(200, 200)), Inches(6), Inches(1.5), width=Inches(2))
+    box = slide.shapes.add_textbox(Inches(1), Inches(5), Inches(8), Inches(1))
+    box.text_frame.text = "Room {room} - {event} - {event date}"
+    out = BytesIO()
+    prs.save(out)
+    return out.getvalue()
+
+
+def _legacy_duplicate_slide(prs: Presentation, src_slide):
+    # Previous implementation from main.py, kept here as the baseline.
+    new_slide = prs.slides.add_slide(src_slide.slide_layout)
+    for shp in list(new_slide.shapes):
+        new_slide.shapes._spTree.remove(shp._element)
+    for shp in src_slide.shapes:
+        if shp.shape_type == MSO_SHAPE_TYPE.PICTURE:
+            new_slide.shapes.add_picture(BytesIO(shp.image.blob), shp.left, shp.top, width=shp.width, height=shp.height)
+        else:
+            new_slide.shapes._spTree.insert_element_before(deepcopy(shp._element), "p:extLst")
+    return new_slide
+
+
+VARIANTS = {"legacy": _legacy_duplicate_slide, "clone": clone_slide}
+
+
+def _build(duplicate, template: bytes, n: int) -> tuple[float, bytes]:
+    t0 = time.perf_counter()
+    prs = Presentation(BytesIO(template))
+    src = prs.slides[0]
+    for _ in range(n):
+        duplicate(prs, src)
+    t_clone = time.perf_counter() - t0
+    remove_slide(prs, 0)
+    out = BytesIO()
+    prs.save(out)
+    return t_clone, out.getvalue()
+
+
+def _maxrss() -> int:
+    """Peak RSS of this process in bytes (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _run(label: str, duplicate, template: bytes, n: int) -> None:
+    # RSS includes libxml2's allocations, which tracemalloc cannot see; measure it on an
+    # untraced pass first, then repeat under tracemalloc for the Python-heap figure.
+    rss_before = _maxrss()
+    t0 = time.perf_counter()
+    t_clone, out = _build(duplicate, template, n)
+    t_total = time.perf_counter() - t0
+    rss_growth = _maxrss() - rss_before
+
+    tracemalloc.start()
+    _build(duplicate, template, n)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<8} {n} slides: {t_clone / n * 1000:7.3f} ms/slide, "
+        f"total {t_total:6.2f}s (incl. save), peak RSS growth {rss_growth / 2**20:7.1f} MiB, "
+        f"traced peak {traced_peak / 2**20:6.1f} MiB, output {len(out) / 2**20:6.2f} MiB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--recipients", type=int, default=500)
+    parser.add_argument("--template", help="PPTX template; defaults to a synthetic one with two pictures")
+    parser.add_argument("--variant", choices=sorted(VARIANTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        with open(args.template, "rb") as f:
+            template = f.read()
+        _run(args.variant, VARIANTS[args.variant], template, args.recipients)
+        return
+
+    # Each variant runs in its own process so peak RSS is not shared between them
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.template
+        if not path:
+            path = os.path.join(tmp, "template.pptx")
+            with open(path, "wb") as f:
+                f.write(_synthetic_template())
+        for variant in VARIANTS:
+            subprocess.run(
+                [sys.executable, __file__, "--variant", variant, "--template", path, "-n", str(args.recipients)],
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, or_, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models import ActivityParticipant, ParticipationChange, ParticipationChangeHorizon
+
+
+def lock(db: Session, school_id: int) -> None:
+    """Serialise saves per school until commit.
+
+    Sequence values are handed out at insert but become visible at commit, so two
+    overlapping saves could commit ids out of order and a reader at the higher cursor
+    would skip the lower one. Holding a transaction-level advisory lock keeps each
+    school's ids committed in order.
+    """
+    db.execute(text("SELECT pg_advisory_xact_lock(hashtext('participation_changes'), :school_id)"), {"school_id": school_id})
+
+
+def record(
+    db: Session,
+    school_id: int,
+    activity_id: int,
+    student_id: int,
+    old: ActivityParticipant | None,
+    new_position: int | None,
+    new_team_name: str | None,
+    deleted: bool,
+    changed_by: str | None,
+) -> None:
+    """Append a change entry if the save actually changes the row. Call before mutating `old`."""
+    old_position = old.position if old else None
+    old_team_name = old.team_name if old else None
+    if deleted:
+        if old is None:
+            return
+        op = "delete"
+        new_position = new_team_name = None
+    elif old is None:
+        op = "insert"
+    elif (old_position, old_team_name) == (new_position, new_team_name):
+        return
+    else:
+        op = "update"
+    db.add(ParticipationChange(
+        school_id=school_id,
+        activity_id=activity_id,
+        student_id=student_id,
+        op=op,
+        old_position=old_position,
+        new_position=new_position,
+        old_team_name=old_team_name,
+        new_team_name=new_team_name,
+        changed_by=changed_by,
+    ))
+
+
+def compact(db: Session, before: datetime) -> int:
+    """Drop log entries older than `before` that are superseded or are tombstones.
+
+    The newest entry per (school, activity, student) survives unless it is a delete,
+    so the log is bounded by the live participation rows plus whatever changed since
+    `before`. Dropping a superseded entry loses only intermediate history, but dropping
+    a tombstone would let a client at an older cursor miss the delete: the school's
+    horizon is raised to the newest dropped tombstone so /changes can tell such clients
+    to resync. Returns the number removed.
+    """
+    latest = (
+        select(func.max(ParticipationChange.id))
+        .group_by(ParticipationChange.school_id, ParticipationChange.activity_id, ParticipationChange.student_id)
+    )
+    dropped_tombstones = (
+        select(ParticipationChange.school_id, func.max(ParticipationChange.id))
+        .where(ParticipationChange.changed_at < before, ParticipationChange.op == "delete")
+        .group_by(ParticipationChange.school_id)
+    )
+    upsert = insert(ParticipationChangeHorizon).from_select(["school_id", "pruned_through"], dropped_tombstones)
+    db.execute(upsert.on_conflict_do_update(
+        index_elements=[ParticipationChangeHorizon.school_id],
+        set_={"pruned_through": func.greatest(ParticipationChangeHorizon.pruned_through, upsert.excluded.pruned_through)},
+    ))
+    result = db.execute(
+        delete(ParticipationChange)
+        .where(ParticipationChange.changed_at < before)
+        .where(or_(ParticipationChange.id.not_in(latest), ParticipationChange.op == "delete"))
+    )
+    db.commit()
+    return result.rowcount
+
+
+def horizon(db: Session, school_id: int) -> int:
+    """Oldest cursor that can still be replayed for `school_id`; anything below must resync."""
+    return db.execute(
+        select(ParticipationChangeHorizon.pruned_through).where(ParticipationChangeHorizon.school_id == school_id)
+    ).scalar() or 0
+
+
+def latest_id(db: Session, school_id: int) -> int:
+    """Cursor at the head of the school's log, for a client starting over after a full fetch."""
+    head = db.execute(
+        select(func.max(ParticipationChange.id)).where(ParticipationChange.school_id == school_id)
+    ).scalar()
+    return max(head or 0, horizon(db, school_id))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compact the participation change log.")
+    parser.add_argument("--keep-days", type=int, default=30, help="keep full history, including deletes, for this many days")
+    args = parser.parse_args()
+
+    from database import SessionLocal
+
+    before = datetime.now(timezone.utc) - timedelta(days=args.keep_days)
+    with SessionLocal() as db:
+        removed = compact(db, before)
+    print(f"Removed {removed} superseded or deleted change entries older than {before:%Y-%m-%d}.")
+
+
+if __name__ == "__main__":
+    main()
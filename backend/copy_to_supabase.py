@@ -1,11 +1,11 @@
 import os
 from typing import Iterable, Callable
 
-from sqlalchemy import create_engine, select, text
+from sqlalchemy import create_engine, func, select, text
 from sqlalchemy.orm import sessionmaker, Session
 from urllib.parse import quote_plus
 
-from models import Base, Student, Activity, ActivityParticipant
+from models import Base, School, Student, Activity, ActivityParticipant
 
 
 def _require_env(var_name: str) -> str:
@@ -33,7 +33,7 @@ def _copy_rows(
 ) -> int:
     total_inserted = 0
     batch: list[object] = []
-    for row in src_session.execute(select_stmt).scalars():
+    for row in src_session.execute(select_stmt):
         instance = row_to_instance(row)
         batch.append(instance)
         if len(batch) >= batch_size:
@@ -79,31 +79,29 @@ def main() -> None:
     Base.metadata.create_all(bind=dst_engine)
 
     with SrcSession() as s_src, DstSession() as s_dst:
-        # Copy activities first
-        print("Copying activities...")
-        inserted_acts = _copy_rows(
-            s_src,
-            s_dst,
-            select(Activity),
-            lambda a: Activity(
-                id=a.id,
-                year=a.year,
-                name=a.name,
-                activity_date=a.activity_date,
-                is_team=a.is_team,
-                show_in_ui=a.show_in_ui,
-            ),
-        )
-        print(f"Inserted activities: {inserted_acts}")
+        # The source predates school tenancy: select only its columns, and derive
+        # school_id from students.school_name on the way in.
+        print("Creating schools...")
+        school_ids: dict[str, int] = {}
+        for name in s_src.execute(select(Student.school_name).distinct().order_by(Student.school_name)).scalars():
+            school = s_dst.execute(select(School).where(School.name == name)).scalar_one_or_none()
+            if school is None:
+                school = School(name=name)
+                s_dst.add(school)
+                s_dst.flush()
+            school_ids[name] = school.id
+        s_dst.commit()
+        print(f"Schools: {len(school_ids)}")
 
         # Copy students
         print("Copying students...")
-        inserted_students = _copy_rows(
-            s_src,
-            s_dst,
-            select(Student),
-            lambda st: Student(
+        student_school: dict[int, int] = {}
+
+        def _student(st):
+            student_school[st.id] = school_ids[st.school_name]
+            return Student(
                 id=st.id,
+                school_id=school_ids[st.school_name],
                 school_name=st.school_name,
                 grade=st.grade,
                 first_name=st.first_name,
@@ -115,18 +113,93 @@ def main() -> None:
                 room=st.room,
                 program_name=st.program_name,
                 parttime_days=st.parttime_days,
+            )
+
+        inserted_students = _copy_rows(
+            s_src,
+            s_dst,
+            select(
+                Student.id, Student.school_name, Student.grade, Student.first_name, Student.last_name,
+                Student.school_year, Student.age, Student.dob, Student.picture, Student.room,
+                Student.program_name, Student.parttime_days,
             ),
+            _student,
         )
         print(f"Inserted students: {inserted_students}")
 
+        # An activity belongs to the school most of its participants come from (ties go
+        # to the lowest school id, as in add_school_tenancy.py); activities nobody has
+        # joined go to the first school. Every other school taking part gets a copy.
+        activity_school: dict[int, int] = {}
+        best: dict[int, int] = {}
+        participating: dict[int, set[int]] = {}
+        counts = s_src.execute(
+            select(ActivityParticipant.activity_id, Student.school_name, func.count())
+            .join(Student, Student.id == ActivityParticipant.student_id)
+            .group_by(ActivityParticipant.activity_id, Student.school_name)
+        )
+        for activity_id, school_name, n in counts:
+            school_id = school_ids[school_name]
+            participating.setdefault(activity_id, set()).add(school_id)
+            top = best.get(activity_id, 0)
+            if n > top or (n == top and school_id < activity_school[activity_id]):
+                best[activity_id] = n
+                activity_school[activity_id] = school_id
+        default_school = min(school_ids.values())
+
+        # Copy activities
+        print("Copying activities...")
+        inserted_acts = _copy_rows(
+            s_src,
+            s_dst,
+            select(
+                Activity.id, Activity.year, Activity.name, Activity.activity_date,
+                Activity.is_team, Activity.show_in_ui,
+            ),
+            lambda a: Activity(
+                id=a.id,
+                school_id=activity_school.get(a.id, default_school),
+                year=a.year,
+                name=a.name,
+                activity_date=a.activity_date,
+                is_team=a.is_team,
+                show_in_ui=a.show_in_ui,
+            ),
+        )
+        print(f"Inserted activities: {inserted_acts}")
+
+        # Copies get new ids, so the sequence must be past the copied ones first
+        _reset_identity_sequence(s_dst, "activities", "id")
+        activity_copy: dict[tuple[int, int], int] = {}
+        for activity_id, school_set in sorted(participating.items()):
+            original = s_dst.get(Activity, activity_id)
+            for school_id in sorted(school_set - {original.school_id}):
+                copy = Activity(
+                    school_id=school_id,
+                    year=original.year,
+                    name=original.name,
+                    activity_date=original.activity_date,
+                    is_team=original.is_team,
+                    show_in_ui=original.show_in_ui,
+                )
+                s_dst.add(copy)
+                s_dst.flush()
+                activity_copy[(activity_id, school_id)] = copy.id
+        s_dst.commit()
+        print(f"Copied shared activities: {len(activity_copy)}")
+
         # Copy junction table
         print("Copying activity participants...")
         inserted_parts = _copy_rows(
             s_src,
             s_dst,
-            select(ActivityParticipant),
+            select(
+                ActivityParticipant.activity_id, ActivityParticipant.student_id,
+                ActivityParticipant.position, ActivityParticipant.team_name,
+            ),
             lambda ap: ActivityParticipant(
-                activity_id=ap.activity_id,
+                school_id=student_school[ap.student_id],
+                activity_id=activity_copy.get((ap.activity_id, student_school[ap.student_id]), ap.activity_id),
                 student_id=ap.student_id,
                 position=ap.position,
                 team_name=ap.team_name,
@@ -136,6 +209,7 @@ def main() -> None:
 
         # Reset sequences for tables with integer identities
         print("Resetting sequences...")
+        _reset_identity_sequence(s_dst, "schools", "id")
         _reset_identity_sequence(s_dst, "activities", "id")
         _reset_identity_sequence(s_dst, "students", "id")
 
@@ -1,5 +1,6 @@
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
 
 from dotenv import load_dotenv
 import os
@@ -31,6 +32,19 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Streaming exports hold their connection for the whole download. They get their own
+# unpooled engine so a long export never takes the request pool's only connection.
+export_engine = create_engine(
+    DATABASE_URL,
+    poolclass=NullPool,
+    connect_args={
+        "connect_timeout": 10,
+        "application_name": "vercel-serverless-export"
+    }
+)
+
+ExportSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=export_engine)
+
 
 class Base(DeclarativeBase):
     pass
@@ -1,19 +1,22 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, Query, Header, UploadFile, File, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, FileResponse, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import select, distinct, delete
-from database import Base, engine, get_db
-from models import Student, Activity, ActivityParticipant
-from schemas import ActivityOut, SaveParticipantsRequest, SaveParticipantsResponse, StudentOut, ParticipantState
+from database import Base, engine, get_db, ExportSessionLocal
+from models import School, Student, Activity, ActivityParticipant, ParticipationChange
+from schemas import ActivityOut, ChangesResponse, SaveParticipantsRequest, SaveParticipantsResponse, SchoolOut, StudentOut, ParticipantState
+from slides import clone_slide, remove_slide, replace_with_picture
 from typing import Literal
 from io import BytesIO
 import re
 import os
-from copy import deepcopy
 from datetime import date as dt_date
 from pptx import Presentation
 from pptx.enum.shapes import MSO_SHAPE_TYPE
+import media
+import exports
+import changelog
 
 
 app = FastAPI(
@@ -52,9 +55,41 @@ def health_check():
     return {"status": "ok", "service": "activity-participation-api"}
 
 
+def get_school_id(
+    x_school_id: int | None = Header(None),
+    school_id: int | None = Query(None),
+    db: Session = Depends(get_db),
+) -> int:
+    """Resolve the tenant for a request.
+
+    Taken from the X-School-Id header, else the school_id query param (for plain
+    download links), else DEFAULT_SCHOOL_ID, else the only school when the database
+    has exactly one (deployments that predate tenancy).
+    """
+    sid = x_school_id if x_school_id is not None else school_id
+    if sid is None and os.getenv("DEFAULT_SCHOOL_ID"):
+        sid = int(os.environ["DEFAULT_SCHOOL_ID"])
+    if sid is None:
+        ids = db.execute(select(School.id).limit(2)).scalars().all()
+        if len(ids) == 1:
+            sid = ids[0]
+    if sid is None:
+        raise HTTPException(status_code=400, detail="School is required (X-School-Id header or school_id query param).")
+    return sid
+
+
+@app.get("/schools", response_model=list[SchoolOut])
+def get_schools(db: Session = Depends(get_db)):
+    return db.execute(select(School).order_by(School.name)).scalars().all()
+
+
 @app.get("/rooms", response_model=list[int])
-def get_rooms(school_year: str | None = Query(None), db: Session = Depends(get_db)):
-    q = select(distinct(Student.room))
+def get_rooms(
+    school_year: str | None = Query(None),
+    school_id: int = Depends(get_school_id),
+    db: Session = Depends(get_db),
+):
+    q = select(distinct(Student.room)).where(Student.school_id == school_id)
     if school_year:
         q = q.where(Student.school_year == school_year)
     rooms = db.execute(q).scalars().all()
@@ -62,11 +97,11 @@ def get_rooms(school_year: str | None = Query(None), db: Session = Depends(get_d
 
 
 @app.get("/activities", response_model=list[ActivityOut])
-def get_activities(db: Session = Depends(get_db)):
+def get_activities(school_id: int = Depends(get_school_id), db: Session = Depends(get_db)):
     acts = (
         db.execute(
             select(Activity)
-            .where(Activity.show_in_ui == True)
+            .where(Activity.school_id == school_id, Activity.show_in_ui == True)
             .order_by(Activity.activity_date.desc(), Activity.name)
         )
         .scalars()
@@ -75,8 +110,8 @@ def get_activities(db: Session = Depends(get_db)):
     return acts
 
 @app.get("/years", response_model=list[str])
-def get_years(db: Session = Depends(get_db)):
-    years = db.execute(select(distinct(Student.school_year))).scalars().all()
+def get_years(school_id: int = Depends(get_school_id), db: Session = Depends(get_db)):
+    years = db.execute(select(distinct(Student.school_year)).where(Student.school_id == school_id)).scalars().all()
     # Filter out nulls and sort descending by academic year string
     years = [y for y in years if y]
     return sorted(years, reverse=True)
@@ -87,20 +122,87 @@ def get_students(
     room: int = Query(...),
     school_year: str | None = Query(None),
     on_date: str | None = None,  # currently informational
+    school_id: int = Depends(get_school_id),
     db: Session = Depends(get_db),
 ):
-    q = select(Student).where(Student.room == room)
+    q = select(Student).where(Student.school_id == school_id, Student.room == room)
     if school_year:
         q = q.where(Student.school_year == school_year)
     students = db.execute(q.order_by(Student.first_name, Student.last_name)).scalars().all()
     return students
 
 
+@app.post("/students/{student_id}/picture", response_model=StudentOut)
+def upload_student_picture(
+    student_id: int,
+    picture: UploadFile = File(...),
+    school_id: int = Depends(get_school_id),
+    db: Session = Depends(get_db),
+):
+    """Ingest a student's picture into the media store and point Student.picture at it."""
+    student = db.get(Student, student_id)
+    if not student or student.school_id != school_id:
+        raise HTTPException(status_code=404, detail="Student not found")
+    content = picture.file.read()
+    if not content:
+        raise HTTPException(status_code=400, detail="Empty picture file.")
+    try:
+        digest = media.ingest(content)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except media.StoreUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    student.picture = media.picture_url(digest)
+    db.commit()
+    db.refresh(student)
+    return student
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    tags = [t.strip() for t in request.headers.get("if-none-match", "").split(",")]
+    return etag in tags or "*" in tags
+
+
+@app.get("/media/{digest}")
+def get_media(digest: str, request: Request):
+    if not media.exists(digest):
+        raise HTTPException(status_code=404, detail="Media not found")
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": media.CACHE_CONTROL}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    try:
+        media_type = media.media_type(digest)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Media not found")
+    return FileResponse(media.original_path(digest), media_type=media_type, headers=headers)
+
+
+@app.get("/media/{digest}/thumb")
+def get_media_thumbnail(digest: str, request: Request):
+    if not media.exists(digest):
+        raise HTTPException(status_code=404, detail="Media not found")
+    etag = f'"{digest}-{media.THUMB_SIZE}"'
+    headers = {"ETag": etag, "Cache-Control": media.CACHE_CONTROL}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    try:
+        path = media.get_thumbnail(digest)
+    except TimeoutError:
+        raise HTTPException(status_code=503, detail="Thumbnail is still being generated.", headers={"Retry-After": "5"})
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except media.StoreUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
+
+
 @app.get("/activities/{activity_id}/participants", response_model=list[ParticipantState])
 def get_participants(
     activity_id: int,
     room: int = Query(...),
     school_year: str | None = Query(None),
+    school_id: int = Depends(get_school_id),
     db: Session = Depends(get_db),
 ):
     """Fetch current participation state for a given activity and room."""
@@ -108,7 +210,9 @@ def get_participants(
         select(ActivityParticipant)
         .join(Student, Student.id == ActivityParticipant.student_id)
         .where(
+            ActivityParticipant.school_id == school_id,
             ActivityParticipant.activity_id == activity_id,
+            Student.school_id == school_id,
             Student.room == room,
         )
     )
@@ -119,12 +223,27 @@ def get_participants(
 
 
 @app.post("/activities/{activity_id}/participants", response_model=SaveParticipantsResponse)
-def save_participants(activity_id: int, req: SaveParticipantsRequest, db: Session = Depends(get_db)):
+def save_participants(
+    activity_id: int,
+    req: SaveParticipantsRequest,
+    school_id: int = Depends(get_school_id),
+    db: Session = Depends(get_db),
+):
     # Validate activity
     act = db.get(Activity, activity_id)
-    if not act:
+    if not act or act.school_id != school_id:
         raise HTTPException(status_code=404, detail="Activity not found")
 
+    # Validate students belong to this school
+    student_ids = {item.student_id for item in req.participants}
+    known = set(
+        db.execute(select(Student.id).where(Student.id.in_(student_ids), Student.school_id == school_id)).scalars()
+    )
+    unknown = sorted(student_ids - known)
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Students not found: {unknown}")
+
+    changelog.lock(db, school_id)
     upserted = 0
     deleted = 0
 
@@ -137,18 +256,25 @@ def save_participants(activity_id: int, req: SaveParticipantsRequest, db: Sessio
             if not item.team_name or not item.team_name.strip():
                 raise HTTPException(status_code=422, detail=f"Team name required when saving a position for student_id={item.student_id} in a team activity.")
 
-        existing = db.get(ActivityParticipant, {"activity_id": activity_id, "student_id": item.student_id})
+        existing = db.get(ActivityParticipant, {"school_id": school_id, "activity_id": activity_id, "student_id": item.student_id})
+        position = int(item.position) if item.position else None
+        team_name = item.team_name.strip() if item.team_name else None
+        changelog.record(
+            db, school_id, activity_id, item.student_id, existing,
+            position, team_name, deleted=not should_store, changed_by=req.changed_by,
+        )
 
         if should_store:
             if existing:
-                existing.position = int(item.position) if item.position else None
-                existing.team_name = item.team_name.strip() if item.team_name else None
+                existing.position = position
+                existing.team_name = team_name
             else:
                 ap = ActivityParticipant(
+                    school_id=school_id,
                     activity_id=activity_id,
                     student_id=item.student_id,
-                    position=int(item.position) if item.position else None,
-                    team_name=item.team_name.strip() if item.team_name else None,
+                    position=position,
+                    team_name=team_name,
                 )
                 db.add(ap)
             upserted += 1
@@ -161,6 +287,130 @@ def save_participants(activity_id: int, req: SaveParticipantsRequest, db: Sessio
     return SaveParticipantsResponse(upserted=upserted, deleted=deleted)
 
 
+@app.get("/changes", response_model=ChangesResponse)
+def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    activity_id: int | None = Query(None),
+    school_id: int = Depends(get_school_id),
+    db: Session = Depends(get_db),
+):
+    """Participation changes after `since`, oldest first.
+
+    Pass the returned cursor back as `since` to continue; has_more means another page
+    is ready. Compaction drops superseded entries and deletes past its retention
+    window; if `since` is older than that, resync_required is set and the client must
+    refetch participation in full, then continue from the returned cursor.
+    """
+    q = (
+        select(ParticipationChange)
+        .where(ParticipationChange.school_id == school_id, ParticipationChange.id > since)
+        .order_by(ParticipationChange.id)
+        .limit(limit + 1)
+    )
+    if activity_id is not None:
+        q = q.where(ParticipationChange.activity_id == activity_id)
+    changes = db.execute(q).scalars().all()
+    # Checked after reading the page, so a compaction committing in between is caught
+    if since < changelog.horizon(db, school_id):
+        return ChangesResponse(changes=[], cursor=changelog.latest_id(db, school_id), has_more=False, resync_required=True)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    return ChangesResponse(changes=changes, cursor=changes[-1].id if changes else since, has_more=has_more)
+
+
+ExportFormat = Literal["csv", "xlsx", "parquet"]
+
+EXPORT_COLUMNS: list[exports.Column] = [
+    ("school_year", "str"),
+    ("room", "int"),
+    ("student_id", "int"),
+    ("first_name", "str"),
+    ("last_name", "str"),
+    ("grade", "str"),
+    ("activity_id", "int"),
+    ("activity", "str"),
+    ("activity_date", "date"),
+    ("is_team", "bool"),
+    ("position", "int"),
+    ("team_name", "str"),
+]
+
+_EXPORT_ENCODERS = {
+    "csv": (exports.iter_csv, "text/csv; charset=utf-8"),
+    "xlsx": (exports.iter_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "parquet": (exports.iter_parquet, "application/vnd.apache.parquet"),
+}
+
+
+@app.get("/exports/participation")
+def export_participation(
+    fmt: ExportFormat = Query("csv", alias="format"),
+    school_year: str | None = Query(None),
+    room: int | None = Query(None),
+    activity_id: int | None = Query(None),
+    school_id: int = Depends(get_school_id),
+):
+    """Stream one row per student per activity they participated in.
+
+    Rows are read through a server-side cursor and encoded as they arrive, so the
+    export runs in bounded memory however many rooms and activities it covers.
+    """
+    if fmt == "parquet" and not exports.parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow on the server.")
+
+    q = (
+        select(
+            Student.school_year,
+            Student.room,
+            Student.id,
+            Student.first_name,
+            Student.last_name,
+            Student.grade,
+            Activity.id,
+            Activity.name,
+            Activity.activity_date,
+            Activity.is_team,
+            ActivityParticipant.position,
+            ActivityParticipant.team_name,
+        )
+        .join(ActivityParticipant, ActivityParticipant.student_id == Student.id)
+        .join(Activity, Activity.id == ActivityParticipant.activity_id)
+        .where(
+            Student.school_id == school_id,
+            ActivityParticipant.school_id == school_id,
+            Activity.school_id == school_id,
+            Activity.show_in_ui == True,
+        )
+    )
+    if school_year:
+        q = q.where(Student.school_year == school_year)
+    if room is not None:
+        q = q.where(Student.room == room)
+    if activity_id is not None:
+        q = q.where(Activity.id == activity_id)
+    q = q.order_by(Student.school_year, Student.room, Student.last_name, Student.first_name, Activity.activity_date, Activity.id)
+
+    def rows():
+        # Own session on the unpooled export engine: the request-scoped one from get_db is
+        # closed before the body streams, and the request pool has a single connection
+        db = ExportSessionLocal()
+        try:
+            for row in db.execute(q.execution_options(yield_per=exports.CHUNK_ROWS)):
+                yield tuple(row)
+        finally:
+            db.close()
+
+    encode, media_type = _EXPORT_ENCODERS[fmt]
+    # school_year is free text; keep only header-safe characters (2024–2025 -> 2024-2025)
+    year = re.sub(r"[^A-Za-z0-9_-]+", "-", school_year).strip("-") if school_year else None
+    parts = ["participation", year, f"room{room}" if room is not None else None]
+    filename = "_".join(p for p in parts if p) + f".{fmt}"
+    return StreamingResponse(encode(EXPORT_COLUMNS, rows()), media_type=media_type, headers={
+        "Content-Disposition": f"attachment; filename=\"{filename}\""
+    })
+
+
 def _ordinal(n: int) -> str:
     if 10 <= n % 100 <= 20:
         suf = "th"
@@ -169,29 +419,6 @@ def _ordinal(n: int) -> str:
     return f"{n}{suf}"
 
 
-def _duplicate_slide(prs: Presentation, src_slide):
-    # Create new slide with same layout
-    slide_layout = src_slide.slide_layout
-    new_slide = prs.slides.add_slide(slide_layout)
-    # Remove any auto-created placeholders
-    for shp in list(new_slide.shapes):
-        new_slide.shapes._spTree.remove(shp._element)
-    # Copy shapes from source, preserving pictures via public API
-    for shp in src_slide.shapes:
-        try:
-            if shp.shape_type == MSO_SHAPE_TYPE.PICTURE:
-                img_bytes = shp.image.blob
-                new_slide.shapes.add_picture(BytesIO(img_bytes), shp.left, shp.top, width=shp.width, height=shp.height)
-            else:
-                new_el = deepcopy(shp._element)
-                new_slide.shapes._spTree.insert_element_before(new_el, 'p:extLst')
-        except Exception:
-            # Fallback: deep copy on any unexpected case
-            new_el = deepcopy(shp._element)
-            new_slide.shapes._spTree.insert_element_before(new_el, 'p:extLst')
-    return new_slide
-
-
 def _replace_placeholders(slide, mapping: dict[str, str]) -> None:
     def replace_in_string(text: str) -> str:
         new_text = text
@@ -263,6 +490,28 @@ def _replace_literal(slide, search: str, replace: str) -> None:
                     run.text = run.text.replace(search, replace)
 
 
+_PHOTO_RE = re.compile(r"\s*(?:\{\s*photo\s*\}|\[\s*photo\s*\])\s*", re.IGNORECASE)
+
+
+def _is_photo_box(shape) -> bool:
+    return getattr(shape, "has_text_frame", False) and bool(_PHOTO_RE.fullmatch(shape.text_frame.text))
+
+
+def _place_photo(slide, photo) -> None:
+    """Replace text boxes reading {photo} or [photo] with the student's picture.
+
+    `photo` is an (image_part, px_size) pair, or None when the student has no
+    ingested picture, in which case the box is just removed.
+    """
+    for shape in list(slide.shapes):
+        if not _is_photo_box(shape):
+            continue
+        if photo is not None and shape.width and shape.height:
+            replace_with_picture(slide, shape, *photo)
+        else:
+            shape._element.getparent().remove(shape._element)
+
+
 TemplateKind = Literal[
     'position_individual',
     'position_team',
@@ -278,6 +527,7 @@ def generate_certificates_ppt(
     award_date: str | None = Form(None),
     school_year: str | None = Form(None),
     template: UploadFile = File(...),
+    school_id: int = Depends(get_school_id),
     db: Session = Depends(get_db),
 ):
     act = None
@@ -285,7 +535,7 @@ def generate_certificates_ppt(
     needs_team = template_kind == 'position_team'
     if template_kind in ('position_team', 'position_individual'):
         act = db.get(Activity, activity_id)
-        if not act:
+        if not act or act.school_id != school_id:
             raise HTTPException(status_code=404, detail="Activity not found")
         if not act.show_in_ui:
             raise HTTPException(status_code=400, detail="Selected activity is not available for certificates.")
@@ -300,9 +550,11 @@ def generate_certificates_ppt(
             select(Student, ActivityParticipant)
             .outerjoin(
                 ActivityParticipant,
-                (ActivityParticipant.student_id == Student.id) & (ActivityParticipant.activity_id == activity_id),
+                (ActivityParticipant.school_id == school_id)
+                & (ActivityParticipant.student_id == Student.id)
+                & (ActivityParticipant.activity_id == activity_id),
             )
-            .where(Student.room == room)
+            .where(Student.school_id == school_id, Student.room == room)
         )
         if school_year:
             q = q.where(Student.school_year == school_year)
@@ -322,6 +574,7 @@ def generate_certificates_ppt(
             select(Student, Activity)
             .join(ActivityParticipant, ActivityParticipant.student_id == Student.id)
             .join(Activity, Activity.id == ActivityParticipant.activity_id)
+            .where(Student.school_id == school_id, ActivityParticipant.school_id == school_id, Activity.school_id == school_id)
             .where(Student.room == room)
             .where(ActivityParticipant.position.is_(None))
             .where(Activity.show_in_ui == True)
@@ -365,6 +618,23 @@ def generate_certificates_ppt(
         raise HTTPException(status_code=400, detail="Template must contain at least one slide with placeholders.")
 
     template_slide = prs.slides[0]
+    has_photo = any(_is_photo_box(shape) for shape in template_slide.shapes)
+
+    # One image part per distinct picture, shared by every slide that shows it
+    photo_parts: dict[str, tuple | None] = {}
+
+    def _photo_for(s: Student):
+        digest = media.digest_from_picture(s.picture)
+        if digest is None or not media.exists(digest):
+            return None
+        if digest not in photo_parts:
+            try:
+                image_part = prs.part.package.get_or_add_image_part(media.original_path(digest))
+                photo_parts[digest] = (image_part, image_part._px_size)
+            except ValueError:
+                # Format python-pptx cannot embed; leave the photo box empty
+                photo_parts[digest] = None
+        return photo_parts[digest]
 
     # Build slides
     created_count = 0
@@ -373,7 +643,7 @@ def generate_certificates_ppt(
         date_str = (act.activity_date.isoformat() if isinstance(act.activity_date, dt_date) else str(act.activity_date))
         POS_LABEL = {1: "First", 2: "Second", 3: "Third"}
         for idx, (s, ap) in enumerate(recipients):
-            slide = _duplicate_slide(prs, template_slide)
+            slide = clone_slide(prs, template_slide)
 
             mapping = {
                 "name": f"{s.first_name} {s.last_name}",
@@ -387,6 +657,8 @@ def generate_certificates_ppt(
             if needs_team:
                 mapping["team_name"] = ap.team_name if ap and ap.team_name else ""
 
+            if has_photo:
+                _place_photo(slide, _photo_for(s))
             _replace_placeholders(slide, mapping)
             created_count += 1
     else:
@@ -403,7 +675,7 @@ def generate_certificates_ppt(
             return ", ".join(names)
 
         for s, acts in recipients:
-            slide = _duplicate_slide(prs, template_slide)
+            slide = clone_slide(prs, template_slide)
 
             # Determine award date per student: provided award_date or latest activity date
             if award_date:
@@ -421,6 +693,8 @@ def generate_certificates_ppt(
                 "events": _format_events_str(acts),
                 "room": str(s.room),
             }
+            if has_photo:
+                _place_photo(slide, _photo_for(s))
             _replace_placeholders(slide, mapping)
             # If the template has the literal word "Tournaments", singularize it to "Tournament"
             _replace_literal(slide, "Tournaments", "Tournament")
@@ -428,9 +702,7 @@ def generate_certificates_ppt(
 
     # Remove the original template slide if we created any slides
     if created_count > 0 and len(prs.slides) > 0:
-        sldIdLst = prs.slides._sldIdLst
-        first = sldIdLst[0]
-        sldIdLst.remove(first)
+        remove_slide(prs, 0)
 
     # Stream result
     out = BytesIO()
@@ -0,0 +1,195 @@
+import os
+import re
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+# Content-addressed store for student pictures. Originals live at
+# MEDIA_ROOT/originals/ab/<sha256>, thumbnails at MEDIA_ROOT/thumbs/<size>/ab/<sha256>.jpg.
+# Student.picture points at an ingested picture as "/media/<sha256>".
+#
+# MEDIA_ROOT has no default: it must be persistent, writable storage (e.g. a Render
+# disk). Serverless filesystems such as Vercel's are read-only and wiped between
+# invocations, so without it uploads are refused with StoreUnavailable.
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT") or None
+THUMB_SIZE = int(os.environ.get("MEDIA_THUMB_SIZE", "160"))
+PICTURE_PREFIX = "/media/"
+
+# Files never change for a given digest, so clients may cache them forever.
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Formats stored as uploaded. All of them can be embedded by python-pptx; anything
+# else Pillow can read (WebP, TIFF, ...) is converted to PNG at ingest.
+_STORED_FORMATS = {"JPEG", "PNG", "GIF"}
+
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("MEDIA_WORKERS", "2")), thread_name_prefix="thumbs")
+_pending: dict[str, Future] = {}
+# Reentrant: a done callback registered on an already finished future runs at once,
+# inside schedule_thumbnail's critical section
+_lock = threading.RLock()
+
+
+class StoreUnavailable(RuntimeError):
+    """MEDIA_ROOT is unset or not writable."""
+
+
+def is_digest(value: str) -> bool:
+    return bool(_DIGEST_RE.match(value))
+
+
+def exists(digest: str) -> bool:
+    """True if `digest` names a stored original."""
+    return bool(MEDIA_ROOT) and is_digest(digest) and os.path.exists(original_path(digest))
+
+
+def _require_store() -> None:
+    if not MEDIA_ROOT:
+        raise StoreUnavailable("Picture storage is not configured (set MEDIA_ROOT to persistent storage).")
+    try:
+        os.makedirs(MEDIA_ROOT, exist_ok=True)
+    except OSError as e:
+        raise StoreUnavailable(f"Picture storage is not writable: {e}")
+    if not os.access(MEDIA_ROOT, os.W_OK):
+        raise StoreUnavailable(f"Picture storage is not writable: {MEDIA_ROOT}")
+
+
+def picture_url(digest: str) -> str:
+    return f"{PICTURE_PREFIX}{digest}"
+
+
+def digest_from_picture(picture: str | None) -> str | None:
+    """Return the digest of an ingested picture, or None for legacy paths/URLs."""
+    if not picture or not picture.startswith(PICTURE_PREFIX):
+        return None
+    digest = picture[len(PICTURE_PREFIX):]
+    return digest if is_digest(digest) else None
+
+
+def original_path(digest: str) -> str:
+    return os.path.join(MEDIA_ROOT, "originals", digest[:2], digest)
+
+
+def thumbnail_path(digest: str) -> str:
+    return os.path.join(MEDIA_ROOT, "thumbs", str(THUMB_SIZE), digest[:2], f"{digest}.jpg")
+
+
+def media_type(digest: str) -> str:
+    """Sniff the stored original's image type from its header bytes.
+
+    Raises ValueError for anything ingest would not have stored.
+    """
+    with open(original_path(digest), "rb") as f:
+        head = f.read(8)
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    raise ValueError(f"Unexpected media type for {digest}")
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    # mkstemp gives a name unique across threads and worker processes alike
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _to_png(data: bytes) -> bytes:
+    try:
+        with Image.open(BytesIO(data)) as img:
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ("1", "L", "LA", "P", "RGB", "RGBA"):
+                img = img.convert("RGBA")
+            out = BytesIO()
+            img.save(out, format="PNG")
+    except Exception as e:
+        raise ValueError(f"Not a valid image: {e}")
+    return out.getvalue()
+
+
+def ingest(data: bytes) -> str:
+    """Store picture bytes under their sha256 and queue a thumbnail. Returns the digest.
+
+    JPEG, PNG and GIF are stored as uploaded; other readable formats are converted to
+    PNG first. Raises ValueError if the bytes are not a readable image and
+    StoreUnavailable if they cannot be written.
+    """
+    _require_store()
+    try:
+        with Image.open(BytesIO(data)) as img:
+            fmt = img.format
+            img.verify()
+    except Exception as e:
+        raise ValueError(f"Not a valid image: {e}")
+    if fmt not in _STORED_FORMATS:
+        data = _to_png(data)
+    digest = hashlib.sha256(data).hexdigest()
+    path = original_path(digest)
+    if not os.path.exists(path):
+        try:
+            _write_atomic(path, data)
+        except OSError as e:
+            raise StoreUnavailable(f"Could not store picture: {e}")
+    schedule_thumbnail(digest)
+    return digest
+
+
+def _make_thumbnail(digest: str) -> str:
+    path = thumbnail_path(digest)
+    if not os.path.exists(path):
+        try:
+            with Image.open(original_path(digest)) as img:
+                img = ImageOps.exif_transpose(img)
+                img.thumbnail((THUMB_SIZE, THUMB_SIZE))
+                out = BytesIO()
+                img.convert("RGB").save(out, format="JPEG", quality=85, optimize=True)
+        except Exception as e:
+            raise ValueError(f"Stored picture {digest} could not be decoded ({type(e).__name__}).")
+        try:
+            _write_atomic(path, out.getvalue())
+        except OSError as e:
+            raise StoreUnavailable(f"Could not store thumbnail: {e}")
+    return path
+
+
+def schedule_thumbnail(digest: str) -> Future:
+    """Queue thumbnail generation on the worker pool; concurrent requests share one job."""
+    with _lock:
+        fut = _pending.get(digest)
+        if fut is None:
+            fut = _executor.submit(_make_thumbnail, digest)
+            _pending[digest] = fut
+            fut.add_done_callback(lambda _f: _forget(digest))
+        return fut
+
+
+def _forget(digest: str) -> None:
+    with _lock:
+        _pending.pop(digest, None)
+
+
+def get_thumbnail(digest: str, timeout: float = 10.0) -> str:
+    """Return the thumbnail path, generating it first if the worker has not yet.
+
+    Raises TimeoutError if generation takes longer than `timeout`, ValueError if the
+    original cannot be decoded and StoreUnavailable if the thumbnail cannot be written.
+    """
+    path = thumbnail_path(digest)
+    if os.path.exists(path):
+        return path
+    return schedule_thumbnail(digest).result(timeout=timeout)
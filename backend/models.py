@@ -1,15 +1,25 @@
 from sqlalchemy import (
-    Boolean, Column, Date, ForeignKey, Integer, String, UniqueConstraint
+    BigInteger, Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, String, func
 )
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.types import JSON
+from datetime import datetime
 from database import Base
+import partitions
 
 # Enums saved as strings; parttime_days saved as JSON array of strings.
+# Every table carries school_id (the tenant key); all queries are scoped by it.
+
+class School(Base):
+    __tablename__ = "schools"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    name: Mapped[str] = mapped_column(String(100), nullable=False, unique=True)
+
 
 class Student(Base):
     __tablename__ = "students"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    school_id: Mapped[int] = mapped_column(ForeignKey("schools.id"), nullable=False)
     school_name: Mapped[str] = mapped_column(String(100), nullable=False)
     grade: Mapped[str] = mapped_column(String(10), nullable=False)
     first_name: Mapped[str] = mapped_column(String(50), nullable=False)
@@ -26,10 +36,16 @@ class Student(Base):
         back_populates="student", cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        Index("ix_students_school_room_year", "school_id", "room", "school_year"),
+        Index("ix_students_school_year", "school_id", "school_year"),
+    )
+
 
 class Activity(Base):
     __tablename__ = "activities"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    school_id: Mapped[int] = mapped_column(ForeignKey("schools.id"), nullable=False)
     year: Mapped[int] = mapped_column(Integer, nullable=False)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     activity_date: Mapped[str] = mapped_column(Date, nullable=False)
@@ -41,9 +57,15 @@ class Activity(Base):
         back_populates="activity", cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        Index("ix_activities_school_ui_date", "school_id", "show_in_ui", "activity_date"),
+    )
+
 
 class ActivityParticipant(Base):
     __tablename__ = "activity_participants"
+    # Denormalised from the student so the table can be partitioned by school
+    school_id: Mapped[int] = mapped_column(ForeignKey("schools.id"), primary_key=True)
     activity_id: Mapped[int] = mapped_column(ForeignKey("activities.id"), primary_key=True)
     student_id: Mapped[int] = mapped_column(ForeignKey("students.id"), primary_key=True)
     position: Mapped[int | None] = mapped_column(Integer, nullable=True)  # 1,2,3 or null
@@ -53,5 +75,40 @@ class ActivityParticipant(Base):
     student: Mapped[Student] = relationship(back_populates="participants")
 
     __table_args__ = (
-        UniqueConstraint("activity_id", "student_id", name="uix_activity_student"),
+        Index("ix_participants_school_student", "school_id", "student_id"),
+        partitions.table_kwargs(),
     )
+
+
+partitions.install(ActivityParticipant.__table__, School)
+
+
+# Append-only log of edits to activity_participants, written in the same transaction
+# as the save. id doubles as the sync cursor. op is "insert", "update" or "delete";
+# a delete has no new_* values.
+class ParticipationChange(Base):
+    __tablename__ = "participation_changes"
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    school_id: Mapped[int] = mapped_column(ForeignKey("schools.id"), nullable=False)
+    activity_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    student_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    op: Mapped[str] = mapped_column(String(6), nullable=False)
+    old_position: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    new_position: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    old_team_name: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    new_team_name: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    changed_by: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    changed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_participation_changes_school_id", "school_id", "id"),
+        Index("ix_participation_changes_key", "school_id", "activity_id", "student_id"),
+    )
+
+
+class ParticipationChangeHorizon(Base):
+    # Highest change id per school whose removal by compaction a client could notice
+    # (a dropped tombstone); cursors below it must resync. See changelog.compact.
+    __tablename__ = "participation_change_horizons"
+    school_id: Mapped[int] = mapped_column(ForeignKey("schools.id"), primary_key=True)
+    pruned_through: Mapped[int] = mapped_column(BigInteger, nullable=False)
@@ -0,0 +1,75 @@
+import os
+
+from sqlalchemy import DDL, event, text
+
+# Optional Postgres declarative partitioning of activity_participants by school.
+# Enabled with PARTITION_PARTICIPANTS=1 before the tables are created (or via
+# add_school_tenancy.py --partition on an existing database). Each school gets its own
+# partition when it is inserted, so queries that filter on ActivityParticipant.school_id
+# only touch that school's partition; DEFAULT catches anything else.
+
+TABLE = "activity_participants"
+COLUMNS = "school_id, activity_id, student_id, position, team_name"
+
+
+def enabled() -> bool:
+    return os.environ.get("PARTITION_PARTICIPANTS") == "1"
+
+
+def table_kwargs() -> dict:
+    return {"postgresql_partition_by": "LIST (school_id)"} if enabled() else {}
+
+
+def partition_name(school_id: int) -> str:
+    return f"{TABLE}_school{int(school_id)}"
+
+
+def _exists(conn, name: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+
+
+def is_partitioned(conn) -> bool:
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = :t"
+    ), {"t": TABLE}).scalar())
+
+
+def ensure_school_partition(conn, school_id: int) -> None:
+    """Create the partition for one school if the table is partitioned and it is missing.
+
+    Postgres refuses to add a partition while DEFAULT holds rows it would cover, so
+    DEFAULT is detached for the duration, the school's rows are moved into the new
+    partition and DEFAULT is attached again. Safe to call at any time.
+    """
+    name = partition_name(school_id)
+    if not is_partitioned(conn) or _exists(conn, name):
+        return
+    default = f"{TABLE}_default"
+    has_default = _exists(conn, default)
+    if has_default:
+        conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {default}"))
+    conn.execute(text(f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES IN ({int(school_id)})"))
+    if has_default:
+        conn.execute(text(
+            f"WITH moved AS (DELETE FROM {default} WHERE school_id = :school_id RETURNING {COLUMNS}) "
+            f"INSERT INTO {name} ({COLUMNS}) SELECT {COLUMNS} FROM moved"
+        ), {"school_id": int(school_id)})
+        conn.execute(text(f"ALTER TABLE {TABLE} ATTACH PARTITION {default} DEFAULT"))
+
+
+def install(table, school_cls) -> None:
+    """Attach a DEFAULT partition so inserts for schools without their own partition still
+    land, and give every school inserted through the ORM its own partition."""
+    if not enabled():
+        return
+    event.listen(
+        table,
+        "after_create",
+        DDL(f"CREATE TABLE IF NOT EXISTS {TABLE}_default PARTITION OF {TABLE} DEFAULT").execute_if(dialect="postgresql"),
+    )
+
+    @event.listens_for(school_cls, "after_insert")
+    def _create_partition(mapper, connection, target):
+        if connection.dialect.name == "postgresql":
+            ensure_school_partition(connection, target.id)
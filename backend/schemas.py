@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Literal, Optional, List
-from datetime import date
+from datetime import date, datetime
 
 Weekday = Literal["Mon", "Tue", "Wed", "Thu", "Fri"]
 ProgramName = Literal[
@@ -12,8 +12,16 @@ ProgramName = Literal[
     "holiday",
 ]
 
+class SchoolOut(BaseModel):
+    id: int
+    name: str
+
+    class Config:
+        from_attributes = True
+
 class StudentOut(BaseModel):
     id: int
+    school_id: int
     school_name: str
     grade: str
     first_name: str
@@ -31,6 +39,7 @@ class StudentOut(BaseModel):
 
 class ActivityOut(BaseModel):
     id: int
+    school_id: int
     year: int
     name: str
     activity_date: date
@@ -57,7 +66,30 @@ class ParticipantState(BaseModel):
 class SaveParticipantsRequest(BaseModel):
     room: int
     participants: List[ParticipantDraft]
+    # Who made the change, as entered in the frontend; stored in the change log
+    changed_by: Optional[str] = Field(None, max_length=100)
 
 class SaveParticipantsResponse(BaseModel):
     upserted: int
     deleted: int
+
+class ParticipationChangeOut(BaseModel):
+    id: int
+    activity_id: int
+    student_id: int
+    op: Literal["insert", "update", "delete"]
+    old_position: Optional[int] = None
+    new_position: Optional[int] = None
+    old_team_name: Optional[str] = None
+    new_team_name: Optional[str] = None
+    changed_by: Optional[str] = None
+    changed_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ChangesResponse(BaseModel):
+    changes: List[ParticipationChangeOut]
+    cursor: int
+    has_more: bool
+    resync_required: bool = False
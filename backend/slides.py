@@ -0,0 +1,66 @@
+from copy import deepcopy
+
+from pptx import Presentation
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.package import _Relationship
+from pptx.parts.slide import SlidePart
+
+# A notes slide belongs to exactly one slide, so clones are created without notes
+# (same as a slide added through python-pptx's add_slide).
+_SKIP_RELTYPES = {RT.NOTES_SLIDE}
+
+
+def clone_slide(prs: Presentation, src_slide):
+    """Append a copy of `src_slide` to `prs` and return the new slide.
+
+    Works on the OPC package directly: the slide XML is deep-copied once and every
+    relationship of the source slide (layout, images, media, hyperlinks) is recreated
+    on the clone under the same rId, so r:embed/r:link references in the copied XML
+    stay valid. Image rels point at the media parts already in the package, so no
+    image bytes are read, hashed or duplicated per recipient.
+    """
+    src_part = src_slide.part
+    new_part = SlidePart(
+        prs.part._next_slide_partname,
+        src_part.content_type,
+        src_part.package,
+        deepcopy(src_part._element),
+    )
+    rels = new_part.rels
+    for rId, rel in src_part.rels.items():
+        if rel.reltype in _SKIP_RELTYPES:
+            continue
+        rels._rels[rId] = _Relationship(rels._base_uri, rId, rel.reltype, rel._target_mode, rel._target)
+
+    rId = prs.part.relate_to(new_part, RT.SLIDE)
+    prs.slides._sldIdLst.add_sldId(rId)
+    return new_part.slide
+
+
+def remove_slide(prs: Presentation, index: int) -> None:
+    """Remove the slide at `index`, dropping its part from the saved package.
+
+    Parts it shares with other slides (layout, images) are kept as long as another
+    slide still relates to them.
+    """
+    sldIdLst = prs.slides._sldIdLst
+    sldId = sldIdLst[index]
+    sldIdLst.remove(sldId)
+    prs.part.drop_rel(sldId.rId)
+
+
+def replace_with_picture(slide, shape, image_part, px_size: tuple[int, int]) -> None:
+    """Swap `shape` for a picture of an existing image part, fitted and centred in its box.
+
+    Relates the slide to `image_part` directly, so an image shared by many slides is
+    stored once and never re-read. The picture takes the shape's place in z-order.
+    """
+    px_w, px_h = px_size
+    scale = min(shape.width / px_w, shape.height / px_h)
+    cx, cy = int(px_w * scale), int(px_h * scale)
+    x = shape.left + (shape.width - cx) // 2
+    y = shape.top + (shape.height - cy) // 2
+    rId = slide.part.relate_to(image_part, RT.IMAGE)
+    pic = slide.shapes._add_pic_from_image_part(image_part, rId, x, y, cx, cy)
+    shape._element.addprevious(pic)
+    shape._element.getparent().remove(shape._element)
@@ -1,7 +1,7 @@
 import React, { useEffect, useMemo, useState } from "react";
 import logo from "./assets/logo_afterschool_final.png";
 import { ActivityOut, StudentOut, SaveParticipantsRow, SaveParticipantsRequest, SaveParticipantsResponse, RowState, ParticipantState } from "./libs/types";
-import { api, apiGetParticipants, apiYears } from "./libs/api";
+import { api, apiGetParticipants, apiYears, currentUserName } from "./libs/api";
 import Section from "./components/ui/Section";
 import Pill from "./components/ui/Pill";
 import TabButton from "./components/ui/TabButton";
@@ -154,7 +154,7 @@ export default function App(): JSX.Element {
         try {
             const res = await api<SaveParticipantsResponse>(`/activities/${selectedActivity.id}/participants`, {
                 method: "POST",
-                body: JSON.stringify({ room: selectedRoom, participants } as SaveParticipantsRequest),
+                body: JSON.stringify({ room: selectedRoom, participants, changed_by: currentUserName() } as SaveParticipantsRequest),
             });
             alert(`Saved ✔  upserted=${res.upserted}  deleted=${res.deleted}`);
             await refreshGrid(selectedActivity.id, selectedRoom);
@@ -321,7 +321,7 @@ export default function App(): JSX.Element {
                 {tab === "data" && (
                     <Section title="Import / Export">
                         <p className="text-gray-600 mb-3">JSON export here dumps current UI selections (students in view + grid state). Source of truth remains your backend.</p>
-                        <ExportPanel students={students} activities={activities} grid={grid} />
+                        <ExportPanel students={students} activities={activities} grid={grid} schoolYear={selectedYear} />
                     </Section>
                 )}
             </div>
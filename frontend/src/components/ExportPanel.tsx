@@ -1,7 +1,8 @@
 import React from "react";
 import { ActivityOut, RowState, StudentOut } from "../libs/types";
+import { participationExportUrl } from "../libs/api";
 
-export default function ExportPanel({ students, activities, grid }: { students: StudentOut[]; activities: ActivityOut[]; grid: Map<number, RowState>; }) {
+export default function ExportPanel({ students, activities, grid, schoolYear }: { students: StudentOut[]; activities: ActivityOut[]; grid: Map<number, RowState>; schoolYear?: string | null; }) {
   function buildPayload(): string {
     const entries = Array.from(grid.entries()).map(([student_id, r]) => ({ student_id, ...r }));
     return JSON.stringify({ students, activities, selection: entries }, null, 2);
@@ -70,6 +71,11 @@ export default function ExportPanel({ students, activities, grid }: { students:
       <button onClick={exportJsonSaveAs} disabled={!saveAsSupported} title={saveAsSupported ? "" : "Not available when embedded/insecure; use Download or Open in new tab."} className={`px-3 py-2 rounded-xl text-white ${saveAsSupported ? "bg-orange-500" : "bg-orange-300 cursor-not-allowed"}`}>Save JSON (Save As…)</button>
       <button onClick={openJsonInNewTab} className="px-3 py-2 rounded-xl bg-gray-800 text-white">Open JSON in new tab</button>
       <button onClick={copyToClipboard} className="px-3 py-2 rounded-xl bg-gray-200">Copy JSON</button>
+      <div className="basis-full" />
+      <span className="self-center text-gray-600">Participation spreadsheet{schoolYear ? ` (${schoolYear})` : " (all years)"}:</span>
+      <a href={participationExportUrl("csv", schoolYear)} className="px-3 py-2 rounded-xl bg-orange-600 text-white">CSV</a>
+      <a href={participationExportUrl("xlsx", schoolYear)} className="px-3 py-2 rounded-xl bg-orange-600 text-white">Excel</a>
+      <a href={participationExportUrl("parquet", schoolYear)} className="px-3 py-2 rounded-xl bg-gray-800 text-white">Parquet</a>
     </div>
   );
 }
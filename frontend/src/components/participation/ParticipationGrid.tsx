@@ -1,5 +1,6 @@
 import React from 'react';
 import { StudentOut, RowState, ActivityOut } from '../../libs/types';
+import { pictureThumbUrl } from '../../libs/api';
 
 type Props = {
   students: StudentOut[];
@@ -42,7 +43,19 @@ export default function ParticipationGrid({ students, grid, selectedActivity, up
                     onChange={(e) => upsertRow(s.id, { participated: e.target.checked, position: e.target.checked ? (grid.get(s.id)?.position ?? null) : null })}
                   />
                 </td>
-                <td className="px-3 py-2">{s.first_name} {s.last_name}</td>
+                <td className="px-3 py-2">
+                  <div className="flex items-center gap-2">
+                    {pictureThumbUrl(s.picture) && (
+                      <img
+                        src={pictureThumbUrl(s.picture)!}
+                        alt=""
+                        loading="lazy"
+                        className="h-8 w-8 rounded-full object-cover"
+                      />
+                    )}
+                    <span>{s.first_name} {s.last_name}</span>
+                  </div>
+                </td>
                 <td className="px-3 py-2">
                   <select
                     className="h-10 rounded-lg border px-3 bg-white text-base"
@@ -1,10 +1,13 @@
 import { ActivityOut, ParticipantDraft, Student, ParticipantState } from "./types";
 
 const BASE_URL: string = (import.meta as any).env.VITE_API_BASE || "http://127.0.0.1:8001";
+// School (tenant) this deployment serves; the backend scopes every query by it.
+const SCHOOL_ID: string | undefined = (import.meta as any).env.VITE_SCHOOL_ID;
+const SCHOOL_HEADERS: Record<string, string> = SCHOOL_ID ? { "X-School-Id": SCHOOL_ID } : {};
 
 export async function api<T>(path: string, options: RequestInit = {}): Promise<T> {
     const res = await fetch(`${BASE_URL}${path}`, {
-        headers: { "Content-Type": "application/json", ...(options.headers || {}) },
+        headers: { "Content-Type": "application/json", ...SCHOOL_HEADERS, ...(options.headers || {}) },
         ...options,
     });
     if (!res.ok) {
@@ -40,7 +43,7 @@ export async function apiSaveParticipants(
 ): Promise<void> {
   await api(`/activities/${activityId}/participants`, {
     method: "POST",
-    body: JSON.stringify(payload),
+    body: JSON.stringify({ ...payload, changed_by: currentUserName() }),
   });
 }
 
@@ -50,10 +53,39 @@ export async function apiGetParticipants(activityId: number, room: number, schoo
   return api<ParticipantState[]>(`/activities/${activityId}/participants?${qs.toString()}`);
 }
 
+// Name recorded with participation saves in the backend change log (changed_by).
+// Asked for once and remembered in this browser; null if the user declines.
+const USER_NAME_KEY = "sunnyDays.userName";
+
+export function currentUserName(): string | null {
+  let name = localStorage.getItem(USER_NAME_KEY);
+  if (!name) {
+    name = window.prompt("Your name (recorded with participation changes):")?.trim().slice(0, 100) || null;
+    if (name) localStorage.setItem(USER_NAME_KEY, name);
+  }
+  return name;
+}
+
+// Thumbnail URL for a picture ingested into the backend media store ("/media/<sha256>").
+// Legacy paths/URLs have no thumbnail and return null.
+export function pictureThumbUrl(picture?: string | null): string | null {
+  if (!picture || !picture.startsWith("/media/")) return null;
+  return `${BASE_URL}${picture}/thumb`;
+}
+
+// Streaming spreadsheet export of participation rows; used as a plain download link.
+export function participationExportUrl(format: "csv" | "xlsx" | "parquet", school_year?: string | null): string {
+  const qs = new URLSearchParams({ format });
+  if (school_year) qs.set("school_year", school_year);
+  if (SCHOOL_ID) qs.set("school_id", SCHOOL_ID);
+  return `${BASE_URL}/exports/participation?${qs.toString()}`;
+}
+
 // Download generated PPT as Blob (multipart/form-data)
 export async function downloadCertificatesPpt(activityId: number, form: FormData): Promise<Blob> {
   const res = await fetch(`${BASE_URL}/activities/${activityId}/certificates/ppt`, {
     method: "POST",
+    headers: SCHOOL_HEADERS,
     body: form,
   });
   if (!res.ok) {
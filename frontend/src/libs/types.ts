@@ -1,5 +1,6 @@
 export type ActivityOut = {
     id: number;
+    school_id: number;
     year: number;
     name: string;
     activity_date: string; // YYYY-MM-DD
@@ -13,6 +14,7 @@ export type StudentOut = {
     last_name: string;
     room: number;
     // backend has more fields; we don't need them here
+    school_id?: number;
     school_name?: string;
     grade?: string;
     school_year?: string;
@@ -33,6 +35,7 @@ export type SaveParticipantsRow = {
 export type SaveParticipantsRequest = {
     room: number;
     participants: SaveParticipantsRow[];
+    changed_by?: string | null;
 };
 
 export type SaveParticipantsResponse = {